@@ -0,0 +1,291 @@
+""" the numbers behind the pages, without streamlit
+
+    import analytics
+    result = analytics.overview(["Egypt", "Jordan"], start="2020-03-01", log=True)
+    detail = analytics.region_detail("Egypt", mode="new cases")
+
+every function works on a datacube.Cube. by default that is the level of
+refresh.current(), pass cube= to use another one (the app passes the one of
+the snapshot it took for the page run).
+"""
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+import applog
+import datacube
+import metrics
+import population
+import refresh
+import regionindex
+import regionnames
+import resultcache
+import timing
+
+
+# level -> (label column of the long frames, population table parent)
+# groups sum the populations of their countries, counties have no table
+LEVELS = {
+    "counties": ("county", None),
+    "states": ("state", "US"),
+    "countries": ("country", "World"),
+    "groups": ("group", "World"),
+}
+# overview() growth column -> function of the cube giving a region x date array,
+# daily growth [%] and doubling time [days] of confirmed, new cases week over week
+GROWTH = {
+    "growth": metrics.growth_rate,
+    "doubling": metrics.doubling_time,
+    "ratio": metrics.case_ratio,
+}
+# log scale charts start after this date, earlier data is too sparse
+LOG_START = datetime.datetime(2020, 2, 16)
+# added to case counts on a log scale, so zeros stay plottable
+LOG_OFFSET = 0.00001
+
+# (level, version) -> Cube, in the order they were built. the last VERSIONS versions
+# are kept, page runs on the snapshot before a refresh swap keep their cube too
+_datasets = {}
+VERSIONS = 2
+_tables = {}
+_lock = threading.Lock()
+
+
+def dataset(level="countries", snap=None):
+    """ Cube of level in snap, by default refresh.current(), kept for the last VERSIONS versions """
+    snap = snap or refresh.current()
+    built = False
+    with _lock:
+        cube = _datasets.get((level, snap["version"]))
+        if cube is None:
+            cube = _datasets[(level, snap["version"])] = datacube.from_snapshot(snap, level)
+            built = True
+            versions = list(dict.fromkeys(v for _, v in _datasets))
+            for key in [k for k in _datasets if k[1] in versions[:-VERSIONS]]:
+                del _datasets[key]
+    if built:
+        # once per process and version, however often streamlit reruns the page
+        _report_missing(cube, level)
+    return cube
+
+
+def _report_missing(cube, level):
+    """ log the regions of a new cube without a population, which count as 1m """
+    if LEVELS[level][1] is None:
+        return
+    _, missing = population.align(inhabitants(level), cube.regions)
+    if missing:
+        applog.log("Can't get pop, assuming 1m", level=level, regions=missing)
+
+
+def inhabitants(level="countries"):
+    """ population table of level, see population.load() """
+    with _lock:
+        if level not in _tables:
+            table = population.load(parent=LEVELS[level][1])
+            if level == "groups":
+                table = {regionnames.key(name): sum(population.lookup(table, m, 0) for m in members)
+                         for name, members in regionindex.GROUPS.items()}
+            _tables[level] = table
+        return _tables[level]
+
+
+def children(region, level="countries", snap=None):
+    """ (finer level, its regions whose parent is region), from the rolled up snapshot """
+    finer = {parent: child for child, parent in regionindex.PARENT_LEVEL.items()}.get(level)
+    if finer is None:
+        return (None, [])
+    cube = dataset(finer, snap)
+    return (finer, [r for r, parents in zip(cube.regions, cube.parents) if region in parents])
+
+
+def parents(region, level="countries", snap=None):
+    """ (coarser level, the regions region belongs to) """
+    cube = dataset(level, snap)
+    i = cube.region_id(region)
+    return (regionindex.PARENT_LEVEL.get(level), [] if i is None else list(cube.parents[i]))
+
+
+@timing.timed()
+def group(regions=None, num_default=10, level="countries", cube=None):
+    """ first date position with cases, present region names, and the num_default largest
+
+    regions None means every region of the level. without any cases start is the
+    last date, so it stays a valid position, and without any present region
+    "regions" is empty.
+    """
+    cube = cube or dataset(level)
+    ids, start = cube.trim(regions)
+    start = min(start, max(len(cube.dates) - 1, 0))
+    names = cube.names(ids)
+    confirmed = cube.metric("confirmed")[ids, start:]
+    if confirmed.shape[1] == 0 or len(names) == 0:
+        return {"start": start, "regions": names, "default": names[:num_default]}
+    top = np.argsort(-confirmed[:, -1], kind="stable")[0:num_default]
+    return {"start": start, "regions": names, "default": [names[i] for i in top]}
+
+
+def _date_slice(cube, regions, start, end, log=False):
+    """ positions of the dates from start to end, inclusive, after LOG_START with log """
+    if start is None:
+        start = cube.dates[min(cube.trim(regions)[1], len(cube.dates) - 1)]
+    return cube.date_bounds(start, end, after=LOG_START if log else None)
+
+
+@timing.timed()
+def overview(regions, start=None, end=None, log=False, level="countries", cube=None):
+    """ cases, fatality rate and per-100k of regions between start and end (inclusive)
+
+    returns a dict with
+      confirmed: date-indexed long frame of label, confirmed
+      frate:     date-indexed long frame of label, frate, deaths, confirmed
+      per100k:   label-indexed frame of inhabitants, per100k, totalc at the last date,
+                 sorted by per100k
+      growth:    label-indexed frame of growth, doubling, ratio at the last date
+                 (see GROWTH), sorted by growth
+      max:       the largest case count shown
+    start defaults to the first date with cases in regions, end to the last date.
+    with log, counts are offset by LOG_OFFSET and dates before LOG_START dropped.
+    """
+    cube = cube or dataset(level)
+    label = LEVELS[level][0]
+    table = inhabitants(level)
+    # the window is resolved to positions once and cuts the arrays before they are melted
+    dates = _date_slice(cube, regions, start, end, log=log)
+
+    frame = cube.long_frame(regions, dates=dates, label=label, derived={"frate": metrics.cfr(cube)})
+    confirmed = frame[[label, "confirmed"]].copy()
+    frate = frame[[label, "frate", "deaths", "confirmed"]]
+    if log:
+        confirmed["confirmed"] += LOG_OFFSET
+
+    selected = cube.region_ids(regions)
+    per100k = pd.DataFrame(columns=[label, "inhabitants", "per100k", "totalc"])
+    growth = pd.DataFrame(columns=[label] + list(GROWTH))
+    if len(confirmed):
+        last = dates.stop - 1
+        per100k = pd.DataFrame({
+            label: cube.names(selected),
+            "inhabitants": metrics.inhabitants(cube, table)[selected],
+            "per100k": metrics.per100k(cube, table)[selected, last],
+            "totalc": cube.metric("confirmed")[selected, last],
+        })
+        # computed for every region of the cube at once and cached, only sliced here
+        growth = pd.DataFrame(dict({label: cube.names(selected)},
+                                   **{name: func(cube)[selected, last] for name, func in GROWTH.items()}))
+    per100k = per100k.set_index(label)
+    per100k = per100k.sort_values(ascending=False, by='per100k')
+    growth = growth.set_index(label).sort_values(ascending=False, by="growth")
+
+    return {
+        "confirmed": confirmed,
+        "frate": frate,
+        "per100k": per100k,
+        "growth": growth,
+        "max": float(confirmed.confirmed.max()) if len(confirmed) else 0.0,
+    }
+
+
+# region_detail() mode -> (window in days, "mean" or "sum") of metrics.rolling()
+ROLLING = {
+    "7-day average": (7, "mean"),
+    "14-day average": (14, "mean"),
+    "weekly sum": (7, "sum"),
+}
+DETAIL_MODES = ["total", "new cases"] + list(ROLLING)
+
+
+@timing.timed()
+def region_detail(region, mode="total", start=None, level="countries", cube=None):
+    """ date-indexed frame of one region
+
+    mode "total": cumulative confirmed, deaths, recovered and active cases,
+    mode "new cases": new active cases per day (negative corrections as 0),
+    the ROLLING modes: new active cases per day averaged or summed over a window.
+    start is a date position, by default the first date with cases in region.
+    """
+    cube = cube or dataset(level)
+    row = cube.region_id(region)
+    if row is None:
+        raise KeyError(region)
+    if start is None:
+        start = cube.trim([region])[1]
+    dates = slice(start, None)
+    if mode == "new cases":
+        return pd.DataFrame({"active": metrics.daily_new(cube, "active")[row, dates]},
+                            index=cube.dates[dates])
+    if mode in ROLLING:
+        window, how = ROLLING[mode]
+        return pd.DataFrame({"active": metrics.rolling(cube, window, "active", how)[row, dates]},
+                            index=cube.dates[dates])
+    df = cube.region_frame(region, dates=dates)
+    df["active"] = metrics.active(cube)[row, dates]
+    return df
+
+
+# ranking name -> function of (cube, population table) giving a region x date array
+RANKINGS = {
+    "cfr": lambda cube, table: metrics.cfr(cube),
+    "per100k": lambda cube, table: metrics.per100k(cube, table),
+    "growth": lambda cube, table: metrics.growth_rate(cube),
+    "doubling": lambda cube, table: metrics.doubling_time(cube),
+    "ratio": lambda cube, table: metrics.case_ratio(cube),
+}
+
+
+@timing.timed()
+def ranking(by="per100k", date=None, regions=None, level="countries", cube=None):
+    """ label-indexed frame of regions sorted by a RANKINGS value at date, largest first
+
+    columns are by, confirmed, deaths and inhabitants. date defaults to the last
+    date, regions without a value (no cases for cfr) are left out, and so are
+    regions without a population for per100k, which levels without a
+    population table do not offer.
+    """
+    cube = cube or dataset(level)
+    if by not in RANKINGS:
+        raise ValueError(f"unknown ranking {by!r}")
+    if by == "per100k" and LEVELS[level][1] is None:
+        raise ValueError(f"no populations for level {level!r}")
+    label = LEVELS[level][0]
+    table = inhabitants(level)
+    last = len(cube.dates) - 1
+    if date is not None:
+        if pd.Timestamp(date) not in cube.dates:
+            raise KeyError(f"date {date}")
+        last = cube.dates.get_loc(pd.Timestamp(date))
+    ids = cube.region_ids(regions)
+    df = pd.DataFrame({
+        label: cube.names(ids),
+        by: RANKINGS[by](cube, table)[ids, last],
+        "confirmed": cube.metric("confirmed")[ids, last],
+        "deaths": cube.metric("deaths")[ids, last],
+        "inhabitants": metrics.inhabitants(cube, table)[ids],
+    })
+    if by == "per100k":
+        _, missing = population.align(table, df[label])
+        df = df[~df[label].isin(missing)]
+    df = df.dropna(subset=[by]).set_index(label)
+    return df.sort_values(ascending=False, by=by, kind="stable")
+
+
+def group_summary(region_group, cube=None):
+    """ group() of a regiongroups.Group with its extra_default selected too
+
+    shared in resultcache by every group with the same members until the data changes.
+    """
+    cube = cube or dataset(region_group.level)
+
+    def compute():
+        result = group(region_group.members, num_default=region_group.num_default,
+                       level=region_group.level, cube=cube)
+        present = set(result["regions"])
+        extra = [r for r in region_group.extra_default if r in present and r not in result["default"]]
+        result["default"] = result["default"] + extra
+        return result
+
+    key = ("group", cube.version, region_group.members, region_group.num_default,
+           region_group.extra_default)
+    return resultcache.shared.get(key, compute)
@@ -0,0 +1,213 @@
+""" JSON/CSV http api on the dashboard's data, for scripts and internal tools
+
+    python api.py [--host 127.0.0.1] [--port 8502]
+
+    GET /version?level=countries           dataset version, dates and region count
+    GET /regions?level=countries           region names
+    GET /series/<region>?mode=total        date-indexed counts of one region (analytics.DETAIL_MODES)
+    GET /ranking/<name>?date=              regions sorted by value at date (analytics.RANKINGS)
+
+every endpoint takes level=counties|states|countries|groups and format=json|csv. responses
+carry a weak ETag derived from the dataset version (If-None-Match gives a 304), are
+gzipped when the client accepts it and are kept in resultcache.shared until
+the data changes. runs on the same snapshot as the app, kept fresh by
+refresh.py, point COVID_DATA_BASEURL at fixtures.py output to try it offline.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import urllib.parse
+
+import analytics
+import refresh
+import resultcache
+
+
+HOST = os.environ.get("COVID_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("COVID_API_PORT", 8502))
+# smaller bodies are sent uncompressed
+GZIP_MIN_BYTES = 512
+MAX_HEADER_LINES = 100
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+CONTENT_TYPES = {"json": "application/json", "csv": "text/csv; charset=utf-8"}
+
+class HttpError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or REASONS[status])
+        self.status = status
+
+
+def current_cube(level):
+    """ the level's cube of the snapshot refresh.py swapped in last """
+    if level not in analytics.LEVELS:
+        raise HttpError(400, f"unknown level {level!r}")
+    return analytics.dataset(level)
+
+
+def _records(df, fmt):
+    """ body of a frame, dates as YYYY-MM-DD """
+    df = df.reset_index()
+    if "date" in df:
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8")
+    return df.to_json(orient="records", double_precision=6).encode("utf-8")
+
+
+def _json(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def render(path, query, cube, level):
+    """ (content type, body) of a GET, raises HttpError """
+    fmt = query.get("format", "json")
+    if fmt not in CONTENT_TYPES:
+        raise HttpError(400, f"unknown format {fmt!r}")
+    parts = [urllib.parse.unquote(p) for p in path.strip("/").split("/")]
+    try:
+        if parts == ["version"]:
+            body = _json({"version": cube.version, "level": level, "regions": len(cube.regions),
+                          "first_date": cube.dates[0].strftime("%Y-%m-%d"),
+                          "last_date": cube.dates[-1].strftime("%Y-%m-%d")})
+            return CONTENT_TYPES["json"], body
+        if parts == ["regions"]:
+            if fmt == "csv":
+                return CONTENT_TYPES[fmt], "\n".join(["region"] + cube.regions).encode("utf-8")
+            return CONTENT_TYPES[fmt], _json(cube.regions)
+        if len(parts) == 2 and parts[0] == "series":
+            mode = query.get("mode", "total")
+            if mode not in analytics.DETAIL_MODES:
+                raise HttpError(400, f"unknown mode {mode!r}")
+            df = analytics.region_detail(parts[1], mode=mode, start=0, level=level, cube=cube)
+            return CONTENT_TYPES[fmt], _records(df, fmt)
+        if len(parts) == 2 and parts[0] == "ranking":
+            df = analytics.ranking(parts[1], date=query.get("date"), level=level, cube=cube)
+            return CONTENT_TYPES[fmt], _records(df, fmt)
+    except KeyError as e:
+        raise HttpError(404, f"unknown {e.args[0]}")
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    raise HttpError(404)
+
+
+def _response(content_type, body):
+    """ cached form of a response, compressed once when it is worth it """
+    gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+    return (content_type, body, gzipped)
+
+
+async def handle(method, target, headers):
+    """ (status, headers, body) for a request, headers given lowercased """
+    if method not in ("GET", "HEAD"):
+        raise HttpError(405)
+    url = urllib.parse.urlsplit(target)
+    query = dict(urllib.parse.parse_qsl(url.query))
+    level = query.get("level", "countries")
+    cube = current_cube(level)
+
+    key = ("api", cube.version, url.path, tuple(sorted(query.items())))
+    # weak: the gzip and the identity body share it, a strong one must differ per coding
+    etag = 'W/"%s"' % hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+    out = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    # If-None-Match compares weakly, with or without the W/ prefix
+    tags = [t.strip() for t in headers.get("if-none-match", "").split(",")]
+    if etag[2:] in [t[2:] if t.startswith("W/") else t for t in tags]:
+        return 304, out, b""
+
+    cached = resultcache.shared.lookup(key)
+    if cached is None:
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(
+            None, resultcache.shared.get, key,
+            lambda: _response(*render(url.path, query, cube, level)))
+    content_type, body, gzipped = cached
+    out["Content-Type"] = content_type
+    if gzipped is not None and "gzip" in headers.get("accept-encoding", ""):
+        body = gzipped
+        out["Content-Encoding"] = "gzip"
+    return 200, out, body
+
+
+async def _read_request(reader):
+    """ (method, target, version, headers) or None when the client closed the connection """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400)
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return method, target, version, headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HttpError(400, "too many headers")
+
+
+async def _serve_connection(reader, writer):
+    try:
+        while True:
+            keep_alive = False
+            try:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                status, out, body = await handle(method, target, headers)
+            except HttpError as e:
+                method = "GET"
+                status, out = e.status, {"Content-Type": CONTENT_TYPES["json"]}
+                body = _json({"error": str(e)})
+            except Exception as e:
+                method = "GET"
+                status, out = 500, {"Content-Type": CONTENT_TYPES["json"]}
+                body = _json({"error": f"{type(e).__name__}: {e}"})
+
+            out["Content-Length"] = str(len(body))
+            out["Connection"] = "keep-alive" if keep_alive else "close"
+            head = [f"HTTP/1.1 {status} {REASONS[status]}"] + [f"{k}: {v}" for k, v in out.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST, port=PORT):
+    refresh.start()
+    # the first snapshot may have to be built, not on the event loop
+    await asyncio.get_running_loop().run_in_executor(None, refresh.current)
+    server = await asyncio.start_server(_serve_connection, host, port)
+    print(f"serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON/CSV http api on the dashboard's data")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import atexit
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+
+# log() only puts a record on a queue, a background thread writes them in
+# batches as json lines and rotates the file when it grows past MAX_BYTES.
+LOG_FILE = os.environ.get("COVID_LOG_FILE", "log_app.py.log")
+MAX_BYTES = int(os.environ.get("COVID_LOG_MAX_BYTES", 10_000_000))
+BACKUPS = 3
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0
+QUEUE_SIZE = 10_000
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_lock = threading.Lock()
+_writer = None
+# records dropped because the queue was full, written with the next batch
+_dropped = 0
+
+
+def log(message, path=None, **fields):
+    """ queue one record for path (LOG_FILE by default), never blocks the caller """
+    global _dropped
+    record = {"time": datetime.datetime.now().isoformat(), "msg": message}
+    record.update(fields)
+    _start()
+    try:
+        _queue.put_nowait((path or LOG_FILE, record))
+    except queue.Full:
+        _dropped += 1
+
+
+def flush(timeout=5.0):
+    """ wait until every queued record is written, up to timeout seconds """
+    if _writer is None:
+        return
+    done = threading.Event()
+    try:
+        _queue.put((None, done), timeout=timeout)
+    except queue.Full:
+        return
+    done.wait(timeout)
+
+
+def _start():
+    global _writer
+    if _writer is not None:
+        return
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run, name="applog", daemon=True)
+            _writer.start()
+            atexit.register(flush)
+
+
+def _rotate(path):
+    for i in range(BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def _write(batch):
+    global _dropped
+    if _dropped:
+        dropped, _dropped = _dropped, 0
+        path = next(iter(batch))
+        batch[path].append({"time": datetime.datetime.now().isoformat(),
+                            "msg": "log records dropped", "count": dropped})
+    for path, records in batch.items():
+        lines = "".join(json.dumps(r, default=str) + "\n" for r in records)
+        try:
+            with open(path, "a") as f:
+                f.write(lines)
+                size = f.tell()
+            if size > MAX_BYTES:
+                _rotate(path)
+        except OSError:
+            pass
+
+
+def _run():
+    while True:
+        batch = {}
+        waiters = []
+        count = 0
+        path, record = _queue.get()
+        # collect for at most FLUSH_INTERVAL, or until a flush() is waiting
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while True:
+            if path is None:
+                waiters.append(record)
+                deadline = 0
+            else:
+                batch.setdefault(path, []).append(record)
+                count += 1
+            if count >= BATCH_SIZE:
+                break
+            try:
+                path, record = _queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        if batch:
+            _write(batch)
+        for done in waiters:
+            done.set()
@@ -0,0 +1,179 @@
+""" benchmarks of the data pipeline and page computations on synthetic data
+
+    python bench.py [--regions 200 1000 5000] [--days 60 365 1500] [--repeat 3]
+                    [--out bench_results.json] [--baseline OLD.json]
+
+every stage runs on fixtures.py data in a temporary directory, without a
+browser or a streamlit session. wall time (best and median of --repeat runs)
+and the tracemalloc peak of one extra run are written to --out as json,
+--baseline compares against an earlier run to spot regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import charts
+import datacube
+import fixtures
+import ingest
+import metrics
+import regionindex
+import snapshot
+
+
+# slower than the baseline by more than this factor is reported as a regression,
+# unless both runs are below MIN_SECONDS where the timings are mostly noise
+REGRESSION = 1.2
+MIN_SECONDS = 0.005
+
+
+def measure(func, setup=None, repeat=3):
+    """ time func() repeat times, then trace the peak memory of one more run """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"best_s": min(times), "median_s": statistics.median(times), "peak_mb": peak / 1e6}
+
+
+def stages(data_dir, snap_dir):
+    """ (name, func, setup) of every benchmarked stage, in pipeline order """
+    def cold():
+        ingest.clear()
+        metrics.clear()
+
+    def fresh_cube():
+        # a new Cube has an empty trim memo, as after a data refresh
+        if "snap" not in state:
+            load()
+        state["cube"] = datacube.from_snapshot(state["snap"], "countries")
+        metrics.clear()
+
+    state = {}
+    def read_raw():
+        if "raw" not in state:
+            state["raw"] = ingest.read_raw_data(data_dir)
+
+    def load():
+        state["snap"] = snapshot.load(snap_dir)
+        state["cube"] = datacube.from_snapshot(state["snap"], "countries")
+
+    def overview():
+        cube = state["cube"]
+        regions = analytics.group(cube=cube)["regions"]
+        result = analytics.overview(regions, cube=cube)
+        return charts.overview_chart(result["confirmed"], result["frate"], result["per100k"]).to_dict()
+
+    def by_region():
+        cube = state["cube"]
+        region = cube.regions[int(np.argmax(cube.metric("confirmed")[:, -1]))]
+        analytics.region_detail(region, cube=cube)
+        return analytics.region_detail(region, mode="new cases", cube=cube)
+
+    return [
+        ("read_raw", lambda: ingest.read_raw_data(data_dir), cold),
+        ("rollup", lambda: regionindex.rollup(state["raw"]), read_raw),
+        ("snapshot_build", lambda: snapshot.build(snap_dir, data_dir), cold),
+        ("snapshot_load", load, None),
+        ("trim", lambda: state["cube"].trim(), fresh_cube),
+        ("overview", overview, fresh_cube),
+        ("by_region", by_region, fresh_cube),
+    ]
+
+
+def run(region_counts, day_counts, repeat=3, only=None):
+    results = []
+    for n_regions in region_counts:
+        for n_days in day_counts:
+            with tempfile.TemporaryDirectory() as tmp:
+                data_dir = fixtures.write(os.path.join(tmp, "data"), n_regions, n_days)
+                snap_dir = os.path.join(tmp, "snapshot")
+                snapshot.build(snap_dir, data_dir)
+                for name, func, setup in stages(data_dir, snap_dir):
+                    if only and name not in only:
+                        continue
+                    result = measure(func, setup, repeat)
+                    result.update(stage=name, regions=n_regions, days=n_days)
+                    results.append(result)
+                    print(f"{name:18s} {n_regions:6d} regions {n_days:5d} days "
+                          f"{result['best_s'] * 1000:10.1f} ms {result['peak_mb']:9.1f} MB")
+            ingest.clear()
+            metrics.clear()
+    return results
+
+
+def compare(results, baseline_path):
+    """ print the ratio to a baseline run, return the regressed stages """
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["regions"], r["days"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        old = baseline.get((r["stage"], r["regions"], r["days"]))
+        if old is None or not old["best_s"]:
+            continue
+        ratio = r["best_s"] / old["best_s"]
+        flag = ""
+        if ratio > REGRESSION and r["best_s"] > MIN_SECONDS:
+            flag = "  REGRESSION"
+            regressions.append(r)
+        print(f"{r['stage']:18s} {r['regions']:6d} regions {r['days']:5d} days x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the data pipeline on synthetic data")
+    parser.add_argument("--regions", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--days", type=int, nargs="+", default=[60, 365])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stage", nargs="+", default=None, help="only run these stages")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier --out file to compare with")
+    args = parser.parse_args()
+
+    results = run(args.regions, args.days, args.repeat, args.stage)
+    report = {
+        "commit": _commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        if compare(results, args.baseline):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+
+import resultcache
+import timing
+
+
+# the specs below embed their data, which is already reduced to MAX_POINTS per series
+alt.data_transformers.enable("default", max_rows=None)
+
+# points kept per line, longer series are downsampled with lttb()
+MAX_POINTS = 250
+
+
+def lttb(y, threshold):
+    """ positions of the points kept by largest-triangle-three-buckets downsampling
+
+    the first and last point are always kept, y is assumed to be equally spaced.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    return lttb_rows(np.asarray(y)[None, :], threshold)[0]
+
+
+def lttb_rows(y, threshold):
+    """ lttb() of every row of a series x points array at once, series x threshold positions
+
+    the buckets are the same for every row, so each step is one vectorized
+    operation over all series instead of a python loop per series.
+    """
+    rows, n = y.shape
+    if threshold >= n or threshold < 3:
+        return np.broadcast_to(np.arange(n), (rows, n))
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    everyone = np.arange(rows)
+    keep = np.empty((rows, threshold), dtype=np.intp)
+    keep[:, 0], keep[:, -1] = 0, n - 1
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    a = np.zeros(rows, dtype=np.intp)
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo = hi
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = (nlo + nhi - 1) / 2
+        avg_y = y[:, nlo:nhi].mean(axis=1)
+        xs = np.arange(lo, hi)
+        ya = y[everyone, a][:, None]
+        area = np.abs((a[:, None] - avg_x) * (y[:, lo:hi] - ya) - (a[:, None] - xs) * (avg_y[:, None] - ya))
+        a = lo + np.argmax(area, axis=1)
+        keep[:, i + 1] = a
+    return keep
+
+
+def downsample(df, label, value, max_points=MAX_POINTS):
+    """ keep at most max_points rows per label, chosen by lttb() on value """
+    codes, _ = pd.factorize(df[label])
+    counts = np.bincount(codes)
+    if counts.max() <= max_points:
+        return df
+    if (counts == counts[0]).all():
+        # every label over the same dates (the long frames of datacube): one lttb_rows() call
+        order = np.argsort(codes, kind="stable").reshape(len(counts), counts[0])
+        keep = lttb_rows(df[value].to_numpy()[order], max_points)
+        return df.iloc[np.take_along_axis(order, keep, axis=1).ravel()]
+    parts = []
+    for _, group in df.groupby(label, sort=False):
+        if len(group) > max_points:
+            group = group.iloc[lttb(group[value].to_numpy(), max_points)]
+        parts.append(group)
+    return pd.concat(parts)
+
+
+def compact(df, columns, decimals=None):
+    """ chart data with only columns, dates as plain YYYY-MM-DD and rounded numbers """
+    df = df.reset_index()[columns]
+    if "date" in df:
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    for column, places in (decimals or {}).items():
+        df[column] = df[column].round(places)
+    return df
+
+
+@timing.timed()
+def overview_chart(confirmed, frate, per100k, label="country", unit="Country", units="Countries",
+                   scale=alt.Scale(type='linear'), growth=None):
+    """ per-100k bars, and growth rate bars if given, next to the cases and fatality rate
+    lines of the Overview pages
+    """
+    confirmed = compact(downsample(confirmed, label, "confirmed"), ["date", label, "confirmed"],
+                        {"confirmed": 5})
+    frate = compact(downsample(frate, label, "frate"), ["date", label, "frate", "deaths", "confirmed"],
+                    {"frate": 2})
+    per100k = compact(per100k, [label, "per100k", "inhabitants", "totalc"],
+                      {"per100k": 2, "inhabitants": 3})
+
+    c2 = alt.Chart(confirmed).properties(height=150).mark_line().encode(
+        x=alt.X("date:T", title="Date"),
+        y=alt.Y("confirmed:Q", title="Cases", scale=scale),
+        color=alt.Color(f'{label}:N', title=unit),
+        tooltip=[alt.Tooltip(f'{label}:N', title=unit),
+                 alt.Tooltip('confirmed:Q', title='Total cases', format=".0f")]
+    )
+
+    # case fatality rate...
+    c3 = alt.Chart(frate).properties(height=100).mark_line().encode(
+        x=alt.X("date:T", title="Date"),
+        y=alt.Y("frate:Q", title="Fatality rate [%]", scale=alt.Scale(type='linear')),
+        color=alt.Color(f'{label}:N', title=unit),
+        tooltip=[alt.Tooltip(f'{label}:N', title=unit),
+                 alt.Tooltip('frate:Q', title='Fatality rate'),
+                 alt.Tooltip('deaths:Q', title='Total deaths'),
+                 alt.Tooltip('confirmed:Q', title='Total cases')]
+    )
+
+    c4 = alt.Chart(per100k).properties(width=75).mark_bar().encode(
+        x=alt.X("per100k:Q", title="Cases per 100k inhabitants"),
+        y=alt.Y(f"{label}:N", title=units, sort=None),
+        color=alt.Color(f'{label}:N', title=unit),
+        tooltip=[alt.Tooltip(f'{label}:N', title=unit),
+                 alt.Tooltip('per100k:Q', title='Cases per 100k'),
+                 alt.Tooltip('inhabitants:Q', title='Inhabitants [mio]'),
+                 alt.Tooltip('totalc:Q', title='Total cases')]
+    )
+
+    if growth is None:
+        return alt.hconcat(c4, alt.vconcat(c2, c3))
+
+    # daily growth over the last week, with the doubling time and week over week ratio
+    growth = compact(growth, [label, "growth", "doubling", "ratio"],
+                     {"growth": 2, "doubling": 1, "ratio": 2})
+    c5 = alt.Chart(growth).properties(width=75).mark_bar().encode(
+        x=alt.X("growth:Q", title="Daily growth [%]"),
+        y=alt.Y(f"{label}:N", title=units, sort=None),
+        color=alt.Color(f'{label}:N', title=unit),
+        tooltip=[alt.Tooltip(f'{label}:N', title=unit),
+                 alt.Tooltip('growth:Q', title='Daily growth [%]'),
+                 alt.Tooltip('doubling:Q', title='Doubling time [days]'),
+                 alt.Tooltip('ratio:Q', title='New cases vs. week before')]
+    )
+
+    return alt.hconcat(c4, c5, alt.vconcat(c2, c3))
+
+
+def cached_spec(key, build):
+    """ return the vega-lite dict of the chart build() returns, shared across sessions by key """
+    def compute():
+        chart = build()
+        with timing.stage("to_dict"):
+            return chart.to_dict()
+    with timing.stage("spec"):
+        return resultcache.shared.get(("spec",) + tuple(key), compute)
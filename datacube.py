@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+import ingest
+import regionnames
+
+
+# region sets remembered by Cube.trim(), page groups plus recent selections
+MAX_TRIMS = 256
+
+class Cube:
+    """ metric x region x date array of counts, with name -> position indexes
+
+    basic slices (one metric, a region range, a date window) are views on the
+    underlying array, which is usually memory-mapped from the snapshot.
+    selecting an arbitrary list of regions copies only the selected rows.
+    """
+
+    def __init__(self, values, regions, dates, metrics=ingest.METRICS, coords=None, version=None,
+                 parents=None):
+        self.values = values
+        # identifies the dataset, derived results are cached under it
+        self.version = version
+        self.metrics = list(metrics)
+        self.regions = list(regions)
+        self.date_labels = list(dates)
+        self.dates = pd.DatetimeIndex(pd.to_datetime(self.date_labels, format="%m/%d/%y"), name="date")
+        self.coords = coords
+        # per region, the names of its regions one level up, see regionindex
+        self.parents = parents if parents is not None else [[] for _ in self.regions]
+        self.metric_index = {m: i for i, m in enumerate(self.metrics)}
+        self.region_index = {r: i for i, r in enumerate(self.regions)}
+        # alternative spellings ("Comores", "Cypress") resolve through their key
+        self.region_keys = {regionnames.key(r): i for i, r in enumerate(self.regions)}
+        self.date_index = {d: i for i, d in enumerate(self.date_labels)}
+        # region set -> first date with cases, see trim()
+        self._first_dates = {}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def region_id(self, region):
+        """ row position of region, None if it is unknown """
+        i = self.region_index.get(region)
+        if i is None:
+            i = self.region_keys.get(regionnames.key(region))
+        return i
+
+    def region_ids(self, regions):
+        """ row positions of regions, in the given order, skipping unknown names
+
+        all regions in their stored order give slice(None), so selecting them is a view.
+        """
+        if regions is None:
+            return slice(None)
+        ids = [self.region_id(r) for r in regions]
+        ids = np.array([i for i in ids if i is not None], dtype=np.intp)
+        if len(ids) == len(self.regions) and (ids == np.arange(len(ids))).all():
+            return slice(None)
+        return ids
+
+    def names(self, ids):
+        """ region names of row positions (or a slice) """
+        return list(np.asarray(self.regions, dtype=object)[ids])
+
+    def trim(self, regions=None, metric="confirmed"):
+        """ return (region ids, first date position with any count for those regions)
+
+        memoized per region set, the cube itself is rebuilt for every dataset version.
+        """
+        ids = self.region_ids(regions)
+        key = (metric, None if regions is None else frozenset(regions))
+        if key not in self._first_dates:
+            if len(self._first_dates) >= MAX_TRIMS:
+                self._first_dates.clear()
+            totals = self.metric(metric)[ids].sum(axis=0)
+            nonzero = np.flatnonzero(totals)
+            self._first_dates[key] = int(nonzero[0]) if len(nonzero) else len(self.date_labels)
+        return (ids, self._first_dates[key])
+
+    def date_position(self, date, side="left"):
+        """ position of date in the sorted dates, by binary search, like np.searchsorted() """
+        return int(self.dates.searchsorted(pd.Timestamp(date), side=side))
+
+    def date_bounds(self, start=None, end=None, after=None):
+        """ slice of the date positions from start to end inclusive, and after the date after
+
+        resolved once on the sorted dates, so it can slice the arrays before any reshaping.
+        """
+        lo = 0 if start is None else self.date_position(start)
+        if after is not None:
+            lo = max(lo, self.date_position(after, side="right"))
+        hi = len(self.dates) if end is None else self.date_position(end, side="right")
+        return slice(lo, max(lo, hi))
+
+    def metric(self, metric):
+        """ region x date view of one metric """
+        return self.values[self.metric_index[metric]]
+
+    def select(self, metric, regions=None, dates=slice(None)):
+        """ region x date counts of metric for regions (None for all) over dates """
+        # one indexing step, so only the window of the selected rows is copied
+        return self.metric(metric)[self.region_ids(regions), dates]
+
+    def region_frame(self, region, dates=slice(None)):
+        """ date-indexed frame with one column per metric for a single region """
+        return pd.DataFrame(self.values[:, self.region_id(region), dates].T,
+                            index=self.dates[dates], columns=self.metrics, copy=False)
+
+    def long_frame(self, regions, metrics=("confirmed", "deaths"), dates=slice(None), label="country",
+                   derived=None):
+        """ date-indexed long frame with a label column and one column per metric
+
+        built straight from the array for several metrics at once, without
+        filtering and melting a wide frame per metric.
+        derived maps extra column names to region x date arrays aligned with the cube.
+        """
+        ids = self.region_ids(regions)
+        names = np.asarray(self.regions, dtype=object)[ids]
+        index = self.dates[dates]
+        df = pd.DataFrame({label: np.tile(names, len(index))},
+                          index=index.repeat(len(names)))
+        for metric in metrics:
+            # melt order: every region for the first date, then the next date...
+            df[metric] = self.select(metric, regions, dates).T.ravel().astype(np.float64)
+        for name, values in (derived or {}).items():
+            df[name] = values[ids, dates].T.ravel()
+        return df
+
+
+def from_snapshot(snap, level):
+    """ return the Cube of a snapshot level, sharing the mapped array """
+    info = snap[level]
+    return Cube(info["cube"], info["regions"], info["dates"], coords=info["coords"],
+                version=f"{snap['version']}:{level}", parents=info["parents"])
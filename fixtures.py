@@ -0,0 +1,145 @@
+""" synthetic JHU-format time series, for benchmarks and running the app offline
+
+    python fixtures.py OUT_DIR [--regions N] [--days N] [--seed N]
+    python fixtures.py OUT_DIR --serve PORT [--latency SECONDS]
+
+writes the three files ingest.FILENAMES names. rows are a mix of plain
+countries, countries split into provinces, US states, US county level rows
+("County, ST", the counties of regionindex) and cruise ships, so every filter
+in ingest has work to do. the first countries are the members of the
+regiongroups pages and the states and county suffixes are real, so every
+page, the group level and the county -> state parents have data. point COVID_DATA_BASEURL at OUT_DIR
+to run the app on them, or --serve them over http with an artificial latency
+per request (COVID_DATA_BASEURL=http://127.0.0.1:PORT) to exercise the download path.
+"""
+import argparse
+import datetime
+import functools
+import http.server
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import regiongroups
+import regionindex
+import regionnames
+
+
+FIRST_DATE = datetime.date(2020, 1, 22)
+# real names first, "Country NNN" once they run out. the first few report by province
+COUNTRIES = list(dict.fromkeys(
+    [regionnames.ALIASES.get(c, c) for c in regiongroups.MENA + regiongroups.SOUTH_ASIA + regiongroups.EUROPE]
+    + ["China", "Brazil", "Canada", "Australia", "Japan", "Mexico"]))
+PROVINCE_COUNTRIES = ("China", "Canada", "Australia", "France", "United Kingdom")
+US_STATES = list(regionindex.US_STATES.items())
+
+
+def date_labels(days, first=FIRST_DATE):
+    """ JHU style column labels, m/d/yy """
+    dates = [first + datetime.timedelta(days=i) for i in range(days)]
+    return [f"{d.month}/{d.day}/{d:%y}" for d in dates]
+
+
+def regions(n):
+    """ n (Province/State, Country/Region) pairs shaped like the JHU files """
+    rows = []
+    n_states = max(min(len(US_STATES), n // 4), 1)
+    rows += [(name, "US") for _, name in US_STATES[:n_states]]
+    rows += [("Grand Princess", "US")]
+    # county level rows take a quarter of the regions, in the states above
+    rows += [(f"County {i:04d}, {US_STATES[i % n_states][0]}", "US") for i in range(n // 4)]
+    # a few countries report by province
+    n_provinces = n // 10
+    rows += [(f"Province {i:03d}", PROVINCE_COUNTRIES[i % len(PROVINCE_COUNTRIES)])
+             for i in range(n_provinces)]
+    countries = [c for c in COUNTRIES if c not in PROVINCE_COUNTRIES]
+    i = 0
+    while len(rows) < n:
+        rows.append((None, countries[i] if i < len(countries) else f"Country {i:03d}"))
+        i += 1
+    return rows[:n]
+
+
+def generate(n_regions=200, n_days=60, seed=0):
+    """ return {metric: frame} of cumulative counts in the JHU wide layout """
+    rng = np.random.default_rng(seed)
+    names = regions(n_regions)
+    labels = date_labels(n_days)
+
+    # each region starts at a random day and then grows roughly exponentially
+    start = rng.integers(0, max(n_days // 2, 1), size=n_regions)
+    rate = rng.uniform(0.02, 0.25, size=n_regions)
+    t = np.arange(n_days)[None, :] - start[:, None]
+    expected = np.where(t >= 0, np.exp(np.minimum(rate[:, None] * t, 12)) - 1, 0)
+    new = rng.poisson(np.minimum(expected * rate[:, None], 1e6))
+    confirmed = np.cumsum(new, axis=1)
+    deaths = np.floor(confirmed * rng.uniform(0.005, 0.08, size=(n_regions, 1)))
+    recovered = np.floor(np.roll(confirmed, 14, axis=1) * 0.8)
+    recovered[:, :14] = 0
+
+    lat = rng.uniform(-60, 70, size=n_regions).round(4)
+    lon = rng.uniform(-180, 180, size=n_regions).round(4)
+    frames = {}
+    for metric, values in zip(ingest.METRICS, (confirmed, deaths, recovered)):
+        df = pd.DataFrame(values.astype(np.int64), columns=labels)
+        df.insert(0, "Long", lon)
+        df.insert(0, "Lat", lat)
+        df.insert(0, "Country/Region", [c for _, c in names])
+        df.insert(0, "Province/State", [p for p, _ in names])
+        frames[metric] = df
+    return frames
+
+
+def write(out_dir, n_regions=200, n_days=60, seed=0):
+    """ write the fixture CSVs to out_dir, return out_dir """
+    os.makedirs(out_dir, exist_ok=True)
+    for metric, df in generate(n_regions, n_days, seed).items():
+        df.to_csv(os.path.join(out_dir, ingest.FILENAMES[metric]), index=False)
+    return out_dir
+
+
+class SlowHandler(http.server.SimpleHTTPRequestHandler):
+    """ static files with a delay before every response, answers If-Modified-Since with 304 """
+    latency = 0.0
+
+    def send_head(self):
+        time.sleep(self.latency)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, port=8000, latency=0.0):
+    """ serve directory on localhost until interrupted """
+    handler = functools.partial(type("Handler", (SlowHandler,), {"latency": latency}),
+                                directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"serving {directory} on http://127.0.0.1:{port} with {latency}s latency")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="write synthetic JHU-format time series")
+    parser.add_argument("out", help="output directory")
+    parser.add_argument("--regions", type=int, default=200)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve OUT_DIR instead of writing it")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.out, args.serve, args.latency)
+        return
+    write(args.out, args.regions, args.days, args.seed)
+    print(f"wrote {args.regions} regions x {args.days} days to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
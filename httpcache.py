@@ -0,0 +1,96 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+
+import requests
+
+
+# raw downloads are kept here across restarts, and revalidated with a
+# conditional GET once they are older than CACHE_TTL seconds
+CACHE_DIR = os.environ.get("COVID_CACHE_DIR", ".data_cache")
+CACHE_TTL = int(os.environ.get("COVID_CACHE_TTL", 3600))
+TIMEOUT = 30
+
+# one pooled session, so revalidating the files reuses the connection to the host
+_session = requests.Session()
+
+
+def is_remote(url):
+    return url.startswith("http://") or url.startswith("https://")
+
+
+def _paths(url, cache_dir):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return (os.path.join(cache_dir, key + ".csv"), os.path.join(cache_dir, key + ".json"))
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, data, mode="wb"):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, mode) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def fetch(url, ttl=None, cache_dir=None):
+    """ return (local path, version) for url, downloading only when it changed upstream
+
+    version is a content hash, it stays the same as long as the file does.
+    local paths are returned as they are, versioned by mtime and size.
+    """
+    if not is_remote(url):
+        stat = os.stat(url)
+        return (url, f"{stat.st_mtime_ns}-{stat.st_size}")
+
+    ttl = CACHE_TTL if ttl is None else ttl
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = _paths(url, cache_dir)
+
+    meta = _read_meta(meta_path)
+    if meta is not None and not os.path.isfile(data_path):
+        meta = None
+    if meta is not None and time.time() - meta["checked"] < ttl:
+        return (data_path, meta["sha1"])
+
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        resp = _session.get(url, headers=headers, timeout=TIMEOUT)
+    except requests.RequestException:
+        # upstream is down, serve what we have
+        if meta is not None:
+            return (data_path, meta["sha1"])
+        raise
+
+    if resp.status_code == 304 and meta is not None:
+        meta["checked"] = time.time()
+        _write_atomic(meta_path, json.dumps(meta), mode="w")
+        return (data_path, meta["sha1"])
+
+    resp.raise_for_status()
+    _write_atomic(data_path, resp.content)
+    meta = {
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "sha1": hashlib.sha1(resp.content).hexdigest(),
+        "checked": time.time(),
+        "downloaded": str(datetime.datetime.now()),
+    }
+    _write_atomic(meta_path, json.dumps(meta), mode="w")
+    return (data_path, meta["sha1"])
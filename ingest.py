@@ -0,0 +1,169 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import os
+import re
+import numpy as np
+import pandas as pd
+
+import httpcache
+
+
+# JHU CSSE time series. Set COVID_DATA_BASEURL to another url, or to a local
+# directory holding files with the same names, to run against fixture CSVs.
+DEFAULT_BASEURL = "https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/csse_covid_19_time_series"
+BASEURL = os.environ.get("COVID_DATA_BASEURL", DEFAULT_BASEURL)
+
+METRICS = ("confirmed", "deaths", "recovered")
+FILENAMES = {
+    "confirmed": "time_series_19-covid-Confirmed.csv",
+    "deaths": "time_series_19-covid-Deaths.csv",
+    "recovered": "time_series_19-covid-Recovered.csv",
+}
+
+# bytes of lines parsed at a time, their counts are packed into int32 before the next block
+BLOCK_BYTES = 1 << 20
+LOCATION_COLUMNS = ["Province/State", "Country/Region", "Lat", "Long"]
+# the location fields at the start of a line, a quoted field may hold commas ("Korea, South")
+_LOCATION = re.compile(r'(?:(?:"(?:[^"]|"")*"|[^,"]*),){%d}' % len(LOCATION_COLUMNS))
+
+# raw frames, keyed by source url, rolled up by regionindex.rollup().
+# each entry is (version, frame), a frame is only re-parsed when its version changes
+_raw = {}
+
+# the three series are fetched and parsed concurrently. the downloads wait on
+# the network, and numpy releases the GIL converting the count blocks, so
+# threads overlap most of the work
+_pool = ThreadPoolExecutor(max_workers=len(METRICS), thread_name_prefix="ingest")
+
+
+def map_metrics(func, *args):
+    """ [func(metric, *args) for metric in METRICS], run concurrently
+
+    func must not call map_metrics() itself, the pool has one thread per metric.
+    """
+    return list(_pool.map(lambda metric: func(metric, *args), METRICS))
+
+
+def source_url(metric, baseurl=None):
+    baseurl = (baseurl or BASEURL).rstrip("/")
+    return f"{baseurl}/{FILENAMES[metric]}"
+
+
+def fetch(metric, baseurl=None):
+    """ return (local path, version) of the metric's source file, see httpcache.fetch() """
+    return httpcache.fetch(source_url(metric, baseurl))
+
+
+def _count_rows(path):
+    """ data lines of a file, an upper bound of its rows (JHU fields have no line breaks) """
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_BYTES), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n") - 1
+
+
+def _counts(tails, n):
+    """ rows x n float array of the comma separated count fields of each line """
+    text = ",".join(tails)
+    if ",," in text or text.startswith(",") or text.endswith(","):
+        # blank counts
+        text = ",".join(field or "0" for field in text.split(","))
+    values = np.fromstring(text, sep=",", dtype=np.float64) if text else np.empty(0)
+    if len(values) != len(tails) * n:
+        raise ValueError(f"expected {n} counts on each of {len(tails)} lines, found {len(values)} in total")
+    return values.reshape(len(tails), n)
+
+
+def _dates(path, header_line):
+    """ date labels of a JHU header line """
+    header = next(csv.reader([header_line]))
+    if header[:len(LOCATION_COLUMNS)] != LOCATION_COLUMNS:
+        raise ValueError(f"{path}: expected the columns to start with {LOCATION_COLUMNS}")
+    return header[len(LOCATION_COLUMNS):]
+
+
+def read_csv(path, start=0):
+    """ parse a JHU wide file block by block into compact dtypes
+
+    counts from the start-th date on go straight into one int32 block (blanks as 0),
+    Lat/Long become float32 and the region names categorical. the count fields
+    are converted by numpy, a block at a time, instead of one pandas column per date,
+    and the fields before start are cut off each line unconverted. a line that
+    does not start with the location fields raises ValueError.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        dates = _dates(path, f.readline())
+        counts = np.zeros((max(_count_rows(path), 0), len(dates) - start), dtype=np.int32)
+        locations = []
+        rows = 0
+        # the header is line 1
+        number = 1
+        for lines in iter(lambda: f.readlines(BLOCK_BYTES), []):
+            tails = []
+            for line in lines:
+                number += 1
+                match = _LOCATION.match(line)
+                if match is None:
+                    if not line.strip():
+                        continue
+                    raise ValueError(f"{path}:{number}: expected {len(LOCATION_COLUMNS)} location "
+                                     f"fields, found {line[:80]!r}")
+                location = next(csv.reader([line[:match.end() - 1]]))
+                locations.append(location)
+                tail = line[match.end():].rstrip("\r\n")
+                if start:
+                    # only the fields from start on are converted
+                    tail = tail.split(",", start)[-1]
+                tails.append(tail)
+            if tails:
+                counts[rows:rows + len(tails)] = _counts(tails, len(dates) - start)
+                rows += len(tails)
+
+    location = pd.DataFrame(locations, columns=LOCATION_COLUMNS)
+    df = pd.DataFrame(counts[:rows], columns=dates[start:], copy=False)
+    for i, column in enumerate(LOCATION_COLUMNS):
+        values = location[column]
+        if column in ("Lat", "Long"):
+            values = pd.to_numeric(values, errors="coerce").astype(np.float32)
+        else:
+            values = values.mask(values == "").astype("category")
+        df.insert(i, column, values)
+    return df
+
+
+def read_raw_versioned(metric, baseurl=None):
+    """ return (version, raw JHU frame) for metric, see read_csv()
+
+    the file is revalidated through httpcache, and only parsed again when it changed.
+    """
+    url = source_url(metric, baseurl)
+    path, version = httpcache.fetch(url)
+    cached = _raw.get(url)
+    if cached is None or cached[0] != version:
+        cached = (version, read_csv(path))
+        _raw[url] = cached
+    return cached
+
+
+def read_recent(metric, start, baseurl=None):
+    """ return (all date labels, raw frame with only the date columns from position start on)
+
+    the location columns are kept, so the frame aggregates like a full one.
+    """
+    path, _ = fetch(metric, baseurl)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        dates = _dates(path, f.readline())
+    return dates, read_csv(path, start)
+
+
+def read_raw_data(baseurl=None):
+    """ return the raw (confirmed, deaths, recovered) frames """
+    return tuple(df for _, df in map_metrics(read_raw_versioned, baseurl))
+
+
+def clear():
+    """ forget the parsed frames, the next read parses them again """
+    _raw.clear()
@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+
+import population
+import resultcache
+
+
+# derived region x date arrays, computed for every region of a cube at once and
+# kept per dataset version, so widget changes only slice them. bounded by bytes,
+# to fit next to the app on a 512 MB dyno: the countries and states of a version
+# take a few MB, a counties array about 30 MB. intermediates (logs, running
+# totals) are recomputed rather than kept
+MAX_BYTES = int(os.environ.get("COVID_METRICS_CACHE_BYTES", 200_000_000))
+_cache = resultcache.ResultCache(MAX_BYTES)
+
+
+def _memoize(cube, name, func):
+    return _cache.get((cube.version, name), func)
+
+
+def clear():
+    _cache.clear()
+
+
+def stats():
+    return _cache.stats()
+
+
+def active(cube):
+    """ confirmed - deaths - recovered """
+    return _memoize(cube, "active", lambda: (
+        cube.metric("confirmed") - cube.metric("deaths") - cube.metric("recovered")))
+
+
+def cfr(cube):
+    """ case fatality rate in percent, nan where there are no cases """
+    def compute():
+        confirmed = cube.metric("confirmed").astype(np.float64)
+        out = np.full(confirmed.shape, np.nan)
+        np.divide(cube.metric("deaths") * 100.0, confirmed, out=out, where=confirmed > 0)
+        return out
+    return _memoize(cube, "cfr", compute)
+
+
+def inhabitants(cube, table):
+    """ population in millions aligned with the cube's regions, see population.align() """
+    return _memoize(cube, "inhabitants", lambda: population.align(table, cube.regions)[0])
+
+
+def per100k(cube, table):
+    """ confirmed cases per 100k inhabitants """
+    def compute():
+        pop = inhabitants(cube, table)
+        return cube.metric("confirmed") / (pop[:, None] * 1_000_000) * 100_000
+    return _memoize(cube, "per100k", compute)
+
+
+def daily_new(cube, metric="active"):
+    """ day over day change of metric, negative changes (corrections) clipped to 0 """
+    def compute():
+        values = active(cube) if metric == "active" else cube.metric(metric)
+        new = np.diff(values, axis=1, prepend=0)
+        return np.clip(new, 0, None)
+    return _memoize(cube, f"daily_new:{metric}", compute)
+
+
+def _cumulative_new(cube, metric):
+    """ running total of daily_new(), not kept, one cumulative sum is cheap """
+    return np.cumsum(daily_new(cube, metric), axis=1, dtype=np.int64)
+
+
+def window_sums(csum, window):
+    """ sums over the last window dates of every row, from the row-wise cumulative sums csum
+
+    one subtraction of shifted views whatever the window, the first window - 1
+    dates sum the dates there are.
+    """
+    out = csum.copy()
+    out[:, window:] -= csum[:, :-window]
+    return out
+
+
+def rolling(cube, window, metric="active", how="mean"):
+    """ rolling mean or sum of daily_new() over window days, for every region
+
+    the first window - 1 dates average the days there are.
+    """
+    def compute():
+        sums = window_sums(_cumulative_new(cube, metric), window)
+        if how == "sum":
+            return sums
+        days = np.minimum(np.arange(1, sums.shape[1] + 1), window)
+        return sums / days
+    return _memoize(cube, f"rolling_{how}:{metric}:{window}", compute)
+
+
+# days the growth metrics look back over
+GROWTH_WINDOW = 7
+
+
+def _log_growth(cube, window):
+    """ mean daily change of log confirmed over the last window days, nan for the
+    first window dates and where there are no cases. not kept, see MAX_BYTES
+    """
+    confirmed = cube.metric("confirmed").astype(np.float64)
+    logs = np.full(confirmed.shape, np.nan)
+    np.log(confirmed, out=logs, where=confirmed > 0)
+    out = np.full(logs.shape, np.nan)
+    out[:, window:] = (logs[:, window:] - logs[:, :-window]) / window
+    return out
+
+
+def growth_rate(cube, window=GROWTH_WINDOW):
+    """ compound daily growth of confirmed cases over the last window days, in percent """
+    return _memoize(cube, f"growth_rate:{window}", lambda: np.expm1(_log_growth(cube, window)) * 100)
+
+
+def doubling_time(cube, window=GROWTH_WINDOW):
+    """ days confirmed cases take to double at the growth of the last window days, nan without growth """
+    def compute():
+        rate = _log_growth(cube, window)
+        out = np.full(rate.shape, np.nan)
+        np.divide(np.log(2), rate, out=out, where=rate > 0)
+        return out
+    return _memoize(cube, f"doubling_time:{window}", compute)
+
+
+def case_ratio(cube, window=GROWTH_WINDOW):
+    """ new cases of the last window days over those of the window before, a rough
+    reproduction number. nan without cases in the earlier window
+    """
+    def compute():
+        sums = window_sums(_cumulative_new(cube, "confirmed"), window).astype(np.float64)
+        out = np.full(sums.shape, np.nan)
+        first = 2 * window - 1
+        np.divide(sums[:, first:], sums[:, window - 1:-window], out=out[:, first:],
+                  where=sums[:, window - 1:-window] > 0)
+        return out
+    return _memoize(cube, f"case_ratio:{window}", compute)
@@ -0,0 +1,74 @@
+""" the Overview view of a group page: confirmed cases, fatality rate and cases per 100k
+
+imported by app.group_page() the first time the view is shown, with altair and charts.
+"""
+import datetime
+
+import altair as alt
+import streamlit as st
+
+import analytics
+import charts
+import regiongroups
+import timing
+
+
+def render(group, cube, summary, log):
+    label, unit_name, unit_plural = regiongroups.UNITS[group.level]
+    title = group.title
+    start = summary["start"]
+    regions = summary["regions"]
+    def_regions = summary["default"]
+
+    st.header(f"COVID-19 cases and fatality rate in {title}")
+
+    # none of the group's regions is in the data (e.g. on fixtures.py data)
+    if not summary["regions"]:
+        st.warning(f"No data for the {unit_plural} of {title}.")
+        return
+    st.markdown(f"""\
+        These are the reported case numbers for a selection of {unit_plural}"""
+        """The case fatality rate (CFR) is calculated as:
+        $$
+        CFR[\%] = \\frac{fatalities}{\\textit{all cases}}
+        $$"""
+        f"""
+        ℹ️ You can select/ deselect {unit_plural} and switch between linear and log scales.
+        """)
+
+    select_all = len(regions) < 30 if group.select_all is None else group.select_all
+    if select_all and st.checkbox("select all"):
+        multiselection = st.multiselect(f"Select {unit_plural}:", regions, default=regions)
+    else:
+        multiselection = st.multiselect(f"Select {unit_plural}:", regions, default=def_regions)
+    log("multiselection", page=title, selection=multiselection)
+
+    logscale = st.checkbox("Log scale", True)
+
+    #date filter
+    startDate, endDate = cube.dates[start], cube.dates[-1]
+    if group.date_filter:
+        startDate = st.sidebar.date_input("Start date", value=startDate)
+        endDate = st.sidebar.date_input("End date", value=endDate)
+        # convert date to datetime for comparison purposes
+        startDate = datetime.datetime(startDate.year, startDate.month, startDate.day)
+        endDate = datetime.datetime(endDate.year, endDate.month, endDate.day)
+
+    # saveguard for empty selection
+    if len(multiselection) == 0:
+        return
+
+    def build():
+        result = analytics.overview(multiselection, start=startDate, end=endDate, log=logscale,
+                                    level=group.level, cube=cube)
+        SCALE = alt.Scale(type='linear')
+        if logscale:
+            SCALE = alt.Scale(type='log', domain=[10, int(result["max"])], clamp=True)
+        return charts.overview_chart(result["confirmed"], result["frate"], result["per100k"],
+                                     label=label, unit=unit_name, units=unit_plural, scale=SCALE,
+                                     growth=result["growth"])
+
+    # identical selections share one serialized spec, across sessions and groups
+    key = ("overview", cube.version, tuple(multiselection), logscale, startDate, endDate)
+    with timing.stage("render"):
+        st.vega_lite_chart(spec=charts.cached_spec(key, build), use_container_width=True)
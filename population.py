@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import regionnames
+
+
+# csv file obtained from UN: population.un.org/wpp/Download/Standard/CSV/
+POPULATION_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "countries_pop_2020.csv")
+
+
+def load(parent="World", path=POPULATION_CSV):
+    """ return a dict of region key -> population in millions, for the regions under parent
+
+    keys are regionnames.key() of the names, so lookups are insensitive to the
+    spelling differences between the UN table, JHU and our region lists.
+    """
+    df = pd.read_csv(path, index_col=0, header=0, encoding="utf-8-sig",
+        dtype={'country':str, 'population':np.float64, 'parent':str})
+    df = df[df['parent'] == parent]
+    return {regionnames.key(name): pop for name, pop in df['population'].items()}
+
+
+def lookup(table, region, default=None):
+    return table.get(regionnames.key(region), default)
+
+
+def align(table, regions, default=1):
+    """ return (populations aligned with regions, names without a population)
+
+    regions missing from the table get default, matching what get_pop() assumed.
+    """
+    values = np.array([table.get(regionnames.key(r), np.nan) for r in regions], dtype=np.float64)
+    missing = [r for r, v in zip(regions, values) if np.isnan(v)]
+    values[np.isnan(values)] = default
+    return (values, missing)
@@ -0,0 +1,126 @@
+""" keeps the snapshot fresh from a background thread and swaps new versions in atomically
+
+    refresh.start()           # once per process
+    snap = refresh.current()  # the snapshot to use for a whole page run or request
+    refresh.status()          # swap number, version, last refresh time and duration
+
+current() hands out one snapshot dict, which is never modified, so a reader
+holding it sees one consistent version while a newer one is built. once the
+worker runs, readers never wait on an ingest: until its first refresh is done
+they get the snapshot already on disk. without the worker, the first
+current() refreshes in the foreground and later calls keep that version until
+refresh() is called.
+
+with COVID_REFRESH_MODE=follow a process never ingests, it only maps the newest
+snapshot another process wrote to the same directory (see serve.py).
+"""
+import os
+import threading
+import time
+
+import httpcache
+import snapshot
+
+
+# seconds between refreshes, the remote files are not revalidated more often anyway
+INTERVAL = float(os.environ.get("COVID_REFRESH_INTERVAL", httpcache.CACHE_TTL))
+# "update" brings the snapshot up to date from the sources, "follow" picks up what another process built
+MODE = os.environ.get("COVID_REFRESH_MODE", "update")
+
+# (swap number, snapshot), replaced as a whole
+_current = None
+_status = {"number": 0, "version": None, "mode": None, "refreshed": None, "duration": None,
+           "swapped": None, "error": None}
+_lock = threading.Lock()
+# one refresh at a time, readers do not take it
+_refreshing = threading.Lock()
+_wake = threading.Event()
+_thread = None
+
+
+def _swap(snap, initial=False):
+    """ make snap current if it is a new version, initial only fills an empty slot """
+    global _current
+    with _lock:
+        if initial and _current is not None:
+            return
+        if _current is None or _current[1]["version"] != snap["version"]:
+            number = _status["number"] + 1
+            _current = (number, snap)
+            _status.update(number=number, version=snap["version"], swapped=time.time())
+
+
+def refresh(out_dir=None, baseurl=None):
+    """ bring the snapshot up to date now and swap it in if it changed, return status() """
+    with _refreshing:
+        started = time.perf_counter()
+        try:
+            if MODE == "follow":
+                result = {"mode": "follow"}
+                snap = snapshot.load(out_dir)
+                if snap is None:
+                    raise RuntimeError(f"no snapshot in {out_dir or snapshot.SNAPSHOT_DIR}")
+            else:
+                result = snapshot.update(out_dir, baseurl)
+                snap = snapshot.load(out_dir, result["version"])
+                if snap is None:
+                    raise RuntimeError(f"snapshot {result['version'][:12]} was replaced while loading")
+            _swap(snap)
+            with _lock:
+                _status.update(mode=result["mode"], error=None)
+        except Exception as e:
+            # keep serving the current version, the next refresh tries again
+            with _lock:
+                _status["error"] = f"{type(e).__name__}: {e}"
+            if _current is None:
+                raise
+        finally:
+            with _lock:
+                _status.update(refreshed=time.time(), duration=time.perf_counter() - started)
+    return status()
+
+
+def current(out_dir=None, baseurl=None):
+    """ the current snapshot """
+    if _current is None:
+        snap = snapshot.load(out_dir) if running() else None
+        if snap is not None:
+            _swap(snap, initial=True)
+        else:
+            refresh(out_dir, baseurl)
+    return _current[1]
+
+
+def _run(interval, out_dir, baseurl):
+    while True:
+        try:
+            refresh(out_dir, baseurl)
+        except Exception:
+            # recorded in status(), there is nothing to serve yet
+            pass
+        _wake.wait(interval)
+        _wake.clear()
+
+
+def start(interval=INTERVAL, out_dir=None, baseurl=None):
+    """ start the refresh thread, if it is not running already """
+    global _thread
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, args=(interval, out_dir, baseurl),
+                                       name="snapshot-refresh", daemon=True)
+            _thread.start()
+
+
+def running():
+    return _thread is not None and _thread.is_alive()
+
+
+def wake():
+    """ have the refresh thread refresh now instead of at its next interval """
+    _wake.set()
+
+
+def status():
+    with _lock:
+        return dict(_status, running=running())
@@ -0,0 +1,47 @@
+""" the region groups the app has a page for
+
+a group only declares its members and level, app.group_page() renders every
+one of them from the same analytics functions. the series and derived
+metrics live in one cube per level, so a region in several groups (Greece in
+MENA and Europe) is computed once, and groups with the same members share
+their summary in resultcache.
+"""
+from collections import namedtuple
+
+
+# members None means every region of the level. extra_default are selected on top
+# of the num_default largest, select_all None offers "select all" for short lists only
+Group = namedtuple("Group", ["title", "members", "level", "num_default", "extra_default",
+                             "date_filter", "select_all"])
+Group.__new__.__defaults__ = (None, "countries", 10, (), True, None)
+
+# level -> (label column, unit, units)
+UNITS = {
+    "countries": ("country", "Country", "Countries"),
+    "states": ("state", "State", "States"),
+}
+
+MENA = ("Algeria", "Bahrain", "Egypt", "Iraq", "Jordan", "Kuwait",
+        "Lebanon", "Morocco", "Mauritania", "Oman", "Qatar", "Saudi Arabia", "Somalia",
+        "Sudan", "Tunisia", "United Arab Emirates", "Djibouti", "Comores", "Libya", "Palestine",
+        "Syria", "Yemen", "Iran", "Turkey", "Greece", "Cypress", "Ethiopia", "Eritrea", "South Sudan",
+        "Chad", "Niger", "Mali", "Senegal", "Malta", "Cote d'Ivoire")
+
+EUROPE = ("Germany", "Austria", "Belgium", "Denmark", "France", "Greece", "Italy",
+          "Netherlands", "Norway", "Poland", "Romania", "Spain", "Sweden",
+          "Switzerland", "United Kingdom")
+
+SOUTH_ASIA = ("India", "Pakistan", "Bangladesh", "Afghanistan", "Tajikistan", "Nepal",
+              "Bhutan", "Myanmar", "Laos")
+
+# sidebar page name -> group, in menu order
+PAGES = {
+    "MiddleEast & North Africa": Group("MENA Region", MENA),
+    "South Asia & Neighbors": Group("South Asia & Neighbors", SOUTH_ASIA),
+    # top 10 states by default + 3 states with high per capita confirmed
+    "US States": Group("US States", None, level="states",
+                       extra_default=("Guam", "District of Columbia", "Colorado"),
+                       select_all=True),
+    "Europe": Group("Select EU countries", EUROPE),
+    "World": Group("World", None),
+}
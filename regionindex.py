@@ -0,0 +1,184 @@
+""" region hierarchy county -> state -> country -> group, rolled up once at ingest
+
+every raw JHU row is a leaf. each level is a sparse 0/1 membership matrix
+from the leaves (groups: from the countries) to its regions, kept as CSR index
+arrays, and its series are that matrix times the metric x leaf x date counts:
+one gather and one np.add.reduceat over all dates, per level. the snapshot
+stores every level, so moving up or down the hierarchy is a lookup, raw rows
+are never aggregated again.
+
+    levels, dates = regionindex.rollup(raw_frames)
+    levels["states"].parents   # [["US"], ["US"], ...]
+"""
+from collections import Counter, namedtuple
+
+import numpy as np
+
+import regiongroups
+import regionnames
+
+
+# fine to coarse, each level's parents are regions of the next one
+LEVELS = ("counties", "states", "countries", "groups")
+PARENT_LEVEL = {"counties": "states", "states": "countries", "countries": "groups"}
+COLUMNS = {"counties": "Province/State", "states": "Province/State",
+           "countries": "Country/Region", "groups": "Group"}
+
+# the named country groups, see regiongroups.PAGES
+GROUPS = {page: group.members for page, group in regiongroups.PAGES.items()
+          if group.level == "countries" and group.members is not None}
+
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia",
+    "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois",
+    "IN": "Indiana", "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana",
+    "ME": "Maine", "MD": "Maryland", "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota",
+    "MS": "Mississippi", "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma", "OR": "Oregon",
+    "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina", "SD": "South Dakota",
+    "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont", "VA": "Virginia",
+    "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "AS": "American Samoa", "GU": "Guam", "MP": "Northern Mariana Islands", "PR": "Puerto Rico",
+    "VI": "Virgin Islands",
+}
+
+# regions of a level with their series, parents: list of parent region names per region
+Level = namedtuple("Level", ["column", "regions", "parents", "values", "coords"])
+
+
+class Membership:
+    """ sparse region x member 0/1 matrix in CSR form: the members of region i are
+    indices[indptr[i]:indptr[i + 1]]
+    """
+
+    def __init__(self, regions, indptr, indices):
+        self.regions = regions
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_pairs(cls, members, regions):
+        """ matrix of (member position, region name) pairs, regions sorted by name """
+        names = sorted(set(regions))
+        row = {name: i for i, name in enumerate(names)}
+        rows = np.array([row[r] for r in regions], dtype=np.intp)
+        members = np.asarray(members, dtype=np.intp)
+        order = np.argsort(rows, kind="stable")
+        indptr = np.zeros(len(names) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(rows, minlength=len(names)), out=indptr[1:])
+        return cls(names, indptr, members[order])
+
+    def apply(self, values):
+        """ metric x region x date sums of metric x member x date values """
+        out_shape = (values.shape[0], len(self.regions), values.shape[2])
+        if len(self.indices) == 0:
+            return np.zeros(out_shape, dtype=values.dtype)
+        gathered = values[:, self.indices]
+        starts = np.minimum(self.indptr[:-1], len(self.indices) - 1)
+        sums = np.add.reduceat(gathered, starts, axis=1)
+        # reduceat gives the element at the start for an empty row, not 0
+        sums[:, self.indptr[:-1] == self.indptr[1:]] = 0
+        return sums
+
+    def mean(self, values):
+        """ region x k means of member x k values, ignoring nan """
+        valid = ~np.isnan(values)
+        totals = self.apply(np.where(valid, values, 0)[None])[0]
+        counts = self.apply(valid[None].astype(values.dtype))[0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return totals / counts
+
+
+def _names(column):
+    return np.array([None if v != v else str(v) for v in column], dtype=object)
+
+
+def _locations(df):
+    """ (Province/State, Country/Region) of every row, ValueError if one repeats """
+    keys = list(zip(_names(df["Province/State"]), _names(df["Country/Region"])))
+    if len(set(keys)) != len(keys):
+        repeated = [k for k, n in Counter(keys).items() if n > 1]
+        raise ValueError(f"locations appear more than once: {repeated[:5]}")
+    return keys
+
+
+def _stack(frames, dates):
+    """ metric x row x date int32 counts, rows and dates of every frame matched to the first's
+
+    the series are matched by location and date label, not by position, so files
+    with their rows in another order or a row or date missing (counted as 0)
+    still line up.
+    """
+    keys = _locations(frames[0])
+    position = {k: i for i, k in enumerate(keys)}
+    date_position = {d: i for i, d in enumerate(dates)}
+    counts = np.zeros((len(frames), len(keys), len(dates)), dtype=np.int32)
+    for m, df in enumerate(frames):
+        other = keys if m == 0 else _locations(df)
+        if other == keys and list(df.columns[-len(dates):]) == dates:
+            counts[m] = df[dates].to_numpy(dtype=np.int32)
+            continue
+        rows = np.array([position.get(k, -1) for k in other], dtype=np.intp)
+        present = [d for d in dates if d in df.columns]
+        cols = np.array([date_position[d] for d in present], dtype=np.intp)
+        values = df[present].to_numpy(dtype=np.int32)[rows >= 0]
+        counts[m][np.ix_(rows[rows >= 0], cols)] = values
+    return counts
+
+
+def rollup(frames):
+    """ ({level: Level}, date labels) of raw (confirmed, deaths, recovered) frames, see ingest.read_csv()
+
+    city level rows ("County, ST") are counties of their state and left out of
+    states and countries, cruise ships ("Princess") are left out of the states.
+    the rows, coordinates and dates are those of the first frame, the others are
+    matched to them by location, see _stack().
+    """
+    first = frames[0]
+    dates = [c for c in first.columns if c not in ("Province/State", "Country/Region", "Lat", "Long")]
+    counts = _stack(frames, dates)
+    coords = first[["Lat", "Long"]].to_numpy(dtype=np.float64)
+    province = _names(first["Province/State"])
+    country = _names(first["Country/Region"])
+    has_province = np.array([p is not None for p in province], dtype=bool)
+    has_country = np.array([c is not None for c in country], dtype=bool)
+    city = np.array([p is not None and "," in p for p in province], dtype=bool)
+    ship = np.array([p is not None and "Princess" in p for p in province], dtype=bool)
+    us = country == "US"
+
+    levels = {}
+
+    def add(level, membership, parents, member_values, member_coords):
+        values = membership.apply(member_values)
+        levels[level] = Level(COLUMNS[level], membership.regions, parents, values,
+                              membership.mean(member_coords).astype(np.float32))
+
+    # counties are the city level rows themselves, their parent is the state of ", ST"
+    rows = np.flatnonzero(city)
+    counties = Membership.from_pairs(rows, list(province[rows]))
+    parent = {p: US_STATES.get(p.rsplit(",", 1)[1].strip()) for p in counties.regions}
+    add("counties", counties, [[parent[c]] if parent[c] else [] for c in counties.regions],
+        counts, coords)
+
+    rows = np.flatnonzero(us & ~city & ~ship & has_province)
+    states = Membership.from_pairs(rows, list(province[rows]))
+    add("states", states, [["US"] for _ in states.regions], counts, coords)
+
+    rows = np.flatnonzero(~city & has_country)
+    countries = Membership.from_pairs(rows, list(country[rows]))
+    keys = {regionnames.key(c): i for i, c in enumerate(countries.regions)}
+    pairs = [(keys[regionnames.key(m)], name) for name, members in GROUPS.items()
+             for m in members if regionnames.key(m) in keys]
+    in_groups = {}
+    for i, name in pairs:
+        in_groups.setdefault(i, []).append(name)
+    add("countries", countries, [in_groups.get(i, []) for i in range(len(countries.regions))],
+        counts, coords)
+
+    # groups sum their countries, a country in two groups is counted in both
+    groups = Membership.from_pairs([i for i, _ in pairs], [name for _, name in pairs])
+    add("groups", groups, [[] for _ in groups.regions], levels["countries"].values,
+        levels["countries"].coords.astype(np.float64))
+    return levels, dates
@@ -0,0 +1,44 @@
+import unicodedata
+
+
+# spellings used by the UN population table, JHU, and our own region lists,
+# each mapped to one canonical name. matching also ignores case, accents and
+# a trailing "*" (JHU's "Taiwan*").
+ALIASES = {
+    "Bahamas, The": "Bahamas",
+    "The Bahamas": "Bahamas",
+    "Brunei Darussalam": "Brunei",
+    "Burma": "Myanmar",
+    "Cape Verde": "Cabo Verde",
+    "China, Hong Kong SAR": "Hong Kong",
+    "China, Macao SAR": "Macau",
+    "Comores": "Comoros",
+    "Cypress": "Cyprus",
+    "Czech Republic": "Czechia",
+    "East Timor": "Timor-Leste",
+    "Gambia, The": "Gambia",
+    "The Gambia": "Gambia",
+    "Ivory Coast": "Cote d'Ivoire",
+    "Lao": "Laos",
+    "Republic of Moldova": "Moldova",
+    "Republic of the Congo": "Congo (Brazzaville)",
+    "Russian Federation": "Russia",
+    "Swaziland": "Eswatini",
+    "Viet Nam": "Vietnam",
+    "West Bank and Gaza": "Palestine",
+}
+
+
+def _fold(name):
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return name.strip().rstrip("*").strip().casefold()
+
+
+_aliases = {_fold(k): _fold(v) for k, v in ALIASES.items()}
+
+
+def key(name):
+    """ canonical matching key of a region name """
+    folded = _fold(name)
+    return _aliases.get(folded, folded)
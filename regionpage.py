@@ -0,0 +1,63 @@
+""" the By {unit} view of a group page: active, deceased and recovered cases of one region
+
+imported by app.group_page() the first time the view is shown, with altair.
+"""
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+import analytics
+import regiongroups
+import timing
+
+
+def render(group, cube, summary, log):
+    _, unit_name, unit_plural = regiongroups.UNITS[group.level]
+    title = group.title
+
+    st.header(f"{unit_name} statistics")
+
+    # none of the group's regions is in the data (e.g. on fixtures.py data)
+    if not summary["regions"]:
+        st.warning(f"No data for the {unit_plural} of {title}.")
+        return
+    st.markdown(f"""\
+        The reported number of active, recovered and deceased COVID-19 cases by {unit_name} """
+        """
+        ℹ️ You can select countries and plot data as cummulative counts or new active cases per day,
+        also as 7 and 14 day averages or weekly sums.
+        """)
+
+    # selections
+    selection = st.selectbox(f"Select {unit_name}:", summary["regions"])
+    # new cases per day, as they are or averaged/summed over a window, see analytics.ROLLING
+    cummulative = st.radio("Display type:", analytics.DETAIL_MODES)
+    log("selection", page=title, selection=selection, cummulative=cummulative)
+
+    #scaletransform = st.radio("Plot y-axis", ["linear", "pow"])
+
+    variables = ["active", "deaths", "recovered"]
+
+    df = analytics.region_detail(selection, mode=cummulative, start=summary["start"],
+                                 level=group.level, cube=cube)
+
+    colors = ["orange", "purple", "gray"]
+
+    value_vars = variables
+    SCALE = alt.Scale(domain=variables, range=colors)
+    if cummulative != 'total':
+        value_vars = ['active']
+        SCALE = alt.Scale(domain=variables[0:1], range=colors[0:1])
+
+    dfm = pd.melt(df.reset_index(), id_vars=["date"], value_vars=value_vars)
+
+    c = alt.Chart(dfm.reset_index()).properties(height=200, title=selection).mark_bar(size=10).encode(
+        x=alt.X("date:T", title="Date"),
+        y=alt.Y("value:Q", title="Cases", scale=alt.Scale(type='linear')),
+        color=alt.Color('variable:N', title="Category", scale=SCALE),
+        tooltip=[alt.Tooltip('value:Q', title='Value')]
+    )
+    with timing.stage("render"):
+        st.altair_chart(c, use_container_width=True)
+    st.markdown(f"### Data for {selection}")
+    st.write(df)
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# results shared by every session of the process, evicted least recently used
+# first once their estimated size passes MAX_BYTES
+MAX_BYTES = int(os.environ.get("COVID_RESULT_CACHE_BYTES", 64_000_000))
+
+
+def sizeof(value):
+    """ rough size in bytes of a cached value """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """ thread-safe LRU cache bounded by the estimated size of its values
+
+    concurrent callers asking for the same missing key wait for a single
+    computation instead of all running it.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """ return the value cached for key, computing and storing it on a miss """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            # someone else is computing it, use their result
+            pending.wait()
+
+        try:
+            value = compute()
+            size = sizeof(value)
+            with self._lock:
+                if size <= self.max_bytes:
+                    self._entries[key] = (value, size)
+                    self.size += size
+                    while self.size > self.max_bytes:
+                        _, (_, evicted) = self._entries.popitem(last=False)
+                        self.size -= evicted
+                        self.evictions += 1
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def lookup(self, key, default=None):
+        """ the value cached for key, or default, never computing anything """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+shared = ResultCache()
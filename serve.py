@@ -0,0 +1,131 @@
+""" several app processes on one shared snapshot, behind a local load balancer
+
+    python serve.py [--workers 4] [--port 8501] [--base-port 8600]
+
+this process keeps the snapshot fresh (refresh.py) and forwards connections
+on --port to --workers `streamlit run app.py` processes on base-port, base-port+1...
+the workers run with COVID_REFRESH_MODE=follow: they never ingest, they map
+the .npy files this process writes, so the dataset sits once in the page cache
+however many workers read it. a client sticks to one worker by its address,
+since a streamlit session lives inside one process. workers that exit are
+restarted.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+
+import refresh
+
+
+HOST = "127.0.0.1"
+WORKERS = int(os.environ.get("COVID_WORKERS", os.cpu_count() or 2))
+# seconds between checks of the workers and of the followers' snapshot
+CHECK_INTERVAL = 5
+FOLLOW_INTERVAL = 10
+BUFFER = 64 * 1024
+
+
+def spawn(port):
+    """ start one app worker on port """
+    env = dict(os.environ, COVID_REFRESH_MODE="follow", COVID_REFRESH_INTERVAL=str(FOLLOW_INTERVAL))
+    return subprocess.Popen([sys.executable, "-m", "streamlit", "run", "app.py",
+                             "--server.port", str(port), "--server.address", HOST,
+                             "--server.headless", "true"],
+                            env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(BUFFER)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class Balancer:
+    """ forwards each client connection to the worker its address hashes to """
+
+    def __init__(self, ports):
+        self.ports = ports
+
+    def order(self, client):
+        """ worker ports to try for client, its own worker first """
+        digest = hashlib.sha1(client.encode("utf-8")).digest()
+        first = int.from_bytes(digest[:4], "big") % len(self.ports)
+        return self.ports[first:] + self.ports[:first]
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername") or ("", 0)
+        for port in self.order(peer[0]):
+            try:
+                up_reader, up_writer = await asyncio.open_connection(HOST, port)
+                break
+            except OSError:
+                # down or restarting, the next worker takes the client
+                continue
+        else:
+            writer.close()
+            return
+        await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+
+
+async def supervise(workers):
+    """ restart the workers that exited """
+    while True:
+        await asyncio.sleep(CHECK_INTERVAL)
+        for port, proc in list(workers.items()):
+            if proc.poll() is not None:
+                print(f"worker on port {port} exited with {proc.returncode}, restarting")
+                workers[port] = spawn(port)
+
+
+async def serve(n_workers, port, base_port):
+    loop = asyncio.get_running_loop()
+    # the workers expect a snapshot on disk before they start
+    await loop.run_in_executor(None, refresh.current)
+    refresh.start()
+
+    ports = [base_port + i for i in range(n_workers)]
+    workers = {p: spawn(p) for p in ports}
+    server = await asyncio.start_server(Balancer(ports).handle, "0.0.0.0", port)
+    print(f"serving on port {port}, {n_workers} workers on ports {ports[0]}-{ports[-1]}")
+    try:
+        async with server:
+            await asyncio.gather(server.serve_forever(), supervise(workers))
+    finally:
+        for proc in workers.values():
+            proc.terminate()
+        for proc in workers.values():
+            proc.wait()
+
+
+def _terminate(signum, frame):
+    # stop like on ctrl-c, so the workers are stopped too
+    raise KeyboardInterrupt
+
+
+def main():
+    signal.signal(signal.SIGTERM, _terminate)
+    parser = argparse.ArgumentParser(description="serve the app from several processes")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8501)))
+    parser.add_argument("--base-port", type=int, default=8600)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.workers, args.port, args.base_port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+""" precomputed snapshot of the aggregated time series
+
+build() rolls the cleaned confirmed/deaths/recovered rows up the region
+hierarchy (regionindex.py) and writes one metric x region x date .npy cube
+per level, counties to groups, plus a meta.json header with each region's parents,
+load() maps them back in memory, update() appends the date columns added to
+the sources since the last build, parsing only those and a short lookback window.
+the header records the snapshot format and a hash of the source files, so a
+snapshot built from older data (or by an older version of this code) is
+detected and rebuilt by update().
+
+    python snapshot.py [--out DIR] [--baseurl URL] [--lookback DAYS] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import ingest
+import regionindex
+
+
+# bump whenever the layout or the cleaning in ingest changes
+FORMAT_VERSION = 3
+SNAPSHOT_DIR = os.environ.get("COVID_SNAPSHOT_DIR", ".snapshot")
+# days before the last stored date that update() parses again, JHU revises recent days
+LOOKBACK = int(os.environ.get("COVID_SNAPSHOT_LOOKBACK", 14))
+
+LEVELS = regionindex.LEVELS
+
+
+def source_version(baseurl=None):
+    """ hash of the snapshot format and the current version of every source file """
+    versions = [version for _, version in ingest.map_metrics(ingest.fetch, baseurl)]
+    key = "\n".join([str(FORMAT_VERSION)] + versions)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _save_array(out_dir, name, arr):
+    tmp = os.path.join(out_dir, f".{name}.{os.getpid()}.tmp.npy")
+    np.save(tmp, arr)
+    os.replace(tmp, os.path.join(out_dir, name))
+
+
+def _write(out_dir, version, levels, dates):
+    """ write {level: regionindex.Level} with their dates as the snapshot of version """
+    os.makedirs(out_dir, exist_ok=True)
+    # data files carry the version in their name, and meta.json is replaced last,
+    # so a reader never sees a header pointing at arrays of another build
+    suffix = version[:12]
+
+    meta = {"format": FORMAT_VERSION, "version": version, "built": time.time(), "levels": {}}
+    for level, (column, regions, parents, values, coords) in levels.items():
+        files = {
+            "cube": f"{level}_cube.{suffix}.npy",
+            "coords": f"{level}_coords.{suffix}.npy",
+        }
+        _save_array(out_dir, files["cube"], values)
+        _save_array(out_dir, files["coords"], coords)
+        meta["levels"][level] = {
+            "column": column,
+            "regions": regions,
+            "parents": parents,
+            "dates": dates,
+            "files": files,
+        }
+
+    tmp = os.path.join(out_dir, f".meta.json.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(out_dir, "meta.json"))
+
+    # older builds, readers that still map them keep their open files
+    current = {name for lvl in meta["levels"].values() for name in lvl["files"].values()}
+    for name in os.listdir(out_dir):
+        if name.endswith(".npy") and not name.startswith(".") and name not in current:
+            os.remove(os.path.join(out_dir, name))
+
+
+def build(out_dir=None, baseurl=None):
+    """ aggregate the current source files and write them as a snapshot, return its version """
+    version = source_version(baseurl)
+    levels, dates = regionindex.rollup(ingest.read_raw_data(baseurl))
+    _write(out_dir or SNAPSHOT_DIR, version, levels, dates)
+    return version
+
+
+def update(out_dir=None, baseurl=None, lookback=LOOKBACK):
+    """ bring the snapshot up to date, parsing only the date columns it does not have yet
+
+    the last lookback stored days are parsed again, so revisions of recent days
+    are applied, older revisions need a full build(). falls back to build() when
+    there is no snapshot, or the regions or the earlier dates changed.
+    returns {"version", "mode": current|incremental|full, "new_dates", "revised"},
+    revised counts the stored values a re-parsed day changed (None after a full build).
+    """
+    out_dir = out_dir or SNAPSHOT_DIR
+    version = source_version(baseurl)
+    old = load(out_dir)
+    if old is not None and old["version"] == version:
+        return {"version": version, "mode": "current", "new_dates": 0, "revised": 0}
+
+    levels = None
+    if old is not None:
+        levels, dates, revised = _append(old, baseurl, lookback)
+    if levels is None:
+        return {"version": build(out_dir, baseurl), "mode": "full", "new_dates": None, "revised": None}
+    _write(out_dir, version, levels, dates)
+    new_dates = len(dates) - len(old[LEVELS[0]]["dates"])
+    return {"version": version, "mode": "incremental", "new_dates": new_dates, "revised": revised}
+
+
+def _append(old, baseurl, lookback):
+    """ (levels, dates for _write(), revised count) of old plus the recent source
+    columns, levels is None when the sources no longer extend old
+    """
+    old_dates = old[LEVELS[0]]["dates"]
+    start = max(len(old_dates) - lookback, 0)
+    recent = ingest.map_metrics(ingest.read_recent, start, baseurl)
+    dates = recent[0][0]
+    if any(d != dates for d, _ in recent) or dates[:len(old_dates)] != old_dates:
+        return None, None, 0
+
+    rolled, _ = regionindex.rollup([df for _, df in recent])
+    levels = {}
+    revised = 0
+    for level, recent_level in rolled.items():
+        info = old[level]
+        if recent_level.regions != info["regions"] or info["dates"] != old_dates:
+            return None, None, 0
+        stored = info["cube"][:, :, start:]
+        values = recent_level.values
+        revised += int((stored != values[:, :, :stored.shape[2]]).sum())
+        values = np.concatenate([info["cube"][:, :, :start], values], axis=2)
+        levels[level] = recent_level._replace(values=values)
+    return levels, dates, revised
+
+
+def load(out_dir=None, version=None):
+    """ map a snapshot in memory, None if it is missing, of another format, or not version """
+    out_dir = out_dir or SNAPSHOT_DIR
+    try:
+        with open(os.path.join(out_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != FORMAT_VERSION:
+        return None
+    if version is not None and meta["version"] != version:
+        return None
+
+    snap = {"version": meta["version"], "built": meta["built"]}
+    try:
+        for level, info in meta["levels"].items():
+            arrays = {name: np.load(os.path.join(out_dir, fname), mmap_mode="r")
+                      for name, fname in info["files"].items()}
+            snap[level] = dict(info, **arrays)
+    except OSError:
+        # replaced by a concurrent build
+        return None
+    return snap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build the aggregated time series snapshot")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--baseurl", default=None, help="source base url or directory")
+    parser.add_argument("--lookback", type=int, default=LOOKBACK,
+                        help="recent days to parse again when updating")
+    parser.add_argument("--force", action="store_true", help="full rebuild, even if it is current")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.force:
+        version = build(args.out, args.baseurl)
+        print(f"built snapshot {version[:12]} in {args.out} ({time.time() - start:.2f}s)")
+        return
+    result = update(args.out, args.baseurl, args.lookback)
+    version = result["version"]
+    if result["mode"] == "current":
+        print(f"snapshot {version[:12]} in {args.out} is current")
+        return
+    if result["mode"] == "full":
+        print(f"built snapshot {version[:12]} in {args.out} ({time.time() - start:.2f}s)")
+        return
+    print(f"updated snapshot {version[:12]} in {args.out}: {result['new_dates']} new dates, "
+          f"{result['revised']} revised values ({time.time() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+""" where the cold start of the app goes: import and init time per module
+
+    python startup.py [--module app] [--top 15] [--no-init] [--out startup.json]
+
+imports --module in a fresh interpreter run with -X importtime, like a
+restarted dyno, then does the work of a first page run one step at a time:
+the snapshot, each level's cube, population table and group summaries, and
+the lazily imported views. prints the steps, the slowest modules (import time
+includes running their module level code) and the total per top level package.
+point COVID_DATA_BASEURL at fixtures.py output and COVID_SNAPSHOT_DIR at a
+scratch directory to profile offline.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# runs in the profiled interpreter, prints one json line of init steps
+_CHILD = """
+import json, sys, time
+# __import__, not importlib.import_module(), which -X importtime does not see
+started = time.perf_counter()
+__import__(sys.argv[1])
+steps = [("import " + sys.argv[1], time.perf_counter() - started)]
+
+def step(name, func):
+    t = time.perf_counter()
+    func()
+    steps.append((name, time.perf_counter() - t))
+
+if sys.argv[2] == "1":
+    import analytics, app, refresh, regiongroups
+    snap = {}
+    step("refresh.current", lambda: snap.update(refresh.current()))
+    for page, group in regiongroups.PAGES.items():
+        step(f"cube {group.level}", lambda: analytics.dataset(group.level, snap))
+        step(f"inhabitants {group.level}", lambda: analytics.inhabitants(group.level))
+        step(f"group_summary {page}",
+             lambda: analytics.group_summary(group, cube=analytics.dataset(group.level, snap)))
+    for view in app.VIEWS.values():
+        step(f"import {view}", lambda: __import__(view))
+print(json.dumps([(name, round(s * 1000, 3)) for name, s in steps]))
+"""
+
+
+def _parse_importtime(stderr):
+    """ [(module, self ms, cumulative ms, depth)] of -X importtime output, in import order """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return modules
+
+
+def profile(module="app", init=True):
+    """ {"steps": [(name, ms)], "modules": [(module, self ms, cumulative ms, depth)]} """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _CHILD, module, "1" if init else "0"],
+                          cwd=HERE, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"profiling {module} failed:\n{proc.stderr[-2000:]}")
+    steps = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {"steps": steps, "modules": _parse_importtime(proc.stderr)}
+
+
+def packages(modules):
+    """ {top level package: summed self ms}, largest first """
+    totals = {}
+    for name, self_ms, _, _ in modules:
+        top = name.split(".")[0]
+        totals[top] = totals.get(top, 0) + self_ms
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="profile the cold start of the app")
+    parser.add_argument("--module", default="app", help="module to import")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules and packages to list")
+    parser.add_argument("--no-init", action="store_true", help="only time the imports")
+    parser.add_argument("--out", default=None, help="also write the full profile as json")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = profile(args.module, init=not args.no_init)
+    print(f"cold start of {args.module}: {(time.perf_counter() - started) * 1000:.0f} ms "
+          "including the interpreter")
+
+    print("\nsteps [ms]")
+    for name, ms in result["steps"]:
+        print(f"  {ms:10.1f}  {name}")
+
+    # own modules are listed whatever their rank, they are what we can change
+    own = {name[:-3] for name in os.listdir(HERE) if name.endswith(".py")}
+    modules = result["modules"]
+    slowest = sorted(modules, key=lambda m: -m[2])[:args.top]
+    print("\nslowest modules, cumulative [ms] (self)")
+    for name, self_ms, cumulative_ms, _ in slowest:
+        print(f"  {cumulative_ms:10.1f}  ({self_ms:8.1f})  {name}")
+    print("\nown modules, cumulative [ms] (self)")
+    for name, self_ms, cumulative_ms, _ in modules:
+        if name in own:
+            print(f"  {cumulative_ms:10.1f}  ({self_ms:8.1f})  {name}")
+    print("\npackages, self [ms]")
+    for name, ms in list(packages(modules).items())[:args.top]:
+        print(f"  {ms:10.1f}  {name}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+""" per-stage timings of page runs
+
+    with timing.run("World"):              # one streamlit rerun
+        with timing.stage("overview"):     # spans nest, named "overview/..." inside
+            ...
+
+    @timing.timed()                        # a function as a stage
+    def overview(...): ...
+
+spans are only recorded inside run(), per thread (streamlit reruns every
+session on its own thread), so timed functions called from elsewhere cost a
+thread-local lookup. every finished run is written as one json line to
+TIMING_FILE through applog, and kept in a window for the percentiles of
+summary(). set COVID_TIMING_MEMORY=1 to also record the tracemalloc peak of
+every span, which slows the app down noticeably. tracemalloc counts the whole
+process, so peaks are only recorded for a run no other run overlapped: a run
+starting while another is active records none, and the peaks of a run that
+another one overlapped are dropped when it ends.
+"""
+from collections import defaultdict, deque
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+import applog
+
+
+TIMING_FILE = os.environ.get("COVID_TIMING_FILE", "timings.jsonl")
+TRACE_MEMORY = os.environ.get("COVID_TIMING_MEMORY", "") not in ("", "0")
+# durations kept per stage for summary()
+WINDOW = 1000
+
+_local = threading.local()
+_lock = threading.Lock()
+_durations = defaultdict(lambda: deque(maxlen=WINDOW))
+_last = None
+# runs in progress on any thread, and how many runs started while another was active
+_active = 0
+_overlaps = 0
+
+
+def _tracing():
+    return getattr(_local, "memory", False) and tracemalloc.is_tracing()
+
+
+class _Span:
+    __slots__ = ("name", "start", "base", "peak")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.base = self.peak = 0
+        if _tracing():
+            self.base, self.peak = tracemalloc.get_traced_memory()
+
+
+def _open(name):
+    stack = _local.stack
+    if _tracing():
+        # the parent keeps its peak so far, the child measures from here
+        stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    path = f"{stack[-1].name}/{name}" if len(stack) > 1 else name
+    stack.append(_Span(path))
+
+
+def _close():
+    stack = _local.stack
+    span = stack.pop()
+    record = {"stage": span.name, "ms": round((time.perf_counter() - span.start) * 1000, 3)}
+    if _tracing():
+        peak = max(span.peak, tracemalloc.get_traced_memory()[1])
+        record["peak_mb"] = round((peak - span.base) / 1e6, 3)
+        if stack:
+            stack[-1].peak = max(stack[-1].peak, peak)
+    return record
+
+
+class run:
+    """ context manager timing one page run, see the module docstring """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        global _active, _overlaps
+        with _lock:
+            # only a run alone in the process can tell its own memory from the others'
+            _local.memory = TRACE_MEMORY and _active == 0
+            if _active:
+                _overlaps += 1
+            _active += 1
+            self.overlaps = _overlaps
+        if _local.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _local.stack = [_Span(self.name)]
+        _local.spans = []
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        total = _close()
+        spans = _local.spans
+        del _local.stack, _local.spans, _local.memory
+        with _lock:
+            _active -= 1
+            overlapped = _overlaps != self.overlaps
+        if overlapped:
+            # another run allocated meanwhile, the peaks are not this run's alone
+            total.pop("peak_mb", None)
+            for span in spans:
+                span.pop("peak_mb", None)
+        record = dict(self.fields, run=self.name, ms=total["ms"], spans=spans,
+                      error=exc[0].__name__ if exc[0] else None)
+        if "peak_mb" in total:
+            record["peak_mb"] = total["peak_mb"]
+        _record(record)
+        return False
+
+
+class stage:
+    """ context manager timing one stage of the current run, a no-op outside of run() """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.active = getattr(_local, "stack", None) is not None
+        if self.active:
+            _open(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self.active:
+            _local.spans.append(_close())
+        return False
+
+
+def timed(name=None):
+    """ decorator running a function as a stage, named after it by default """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "stack", None) is None:
+                return func(*args, **kwargs)
+            with stage(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _record(record):
+    global _last
+    with _lock:
+        _last = record
+        _durations[record["run"]].append(record["ms"])
+        for span in record["spans"]:
+            _durations[f"{record['run']}/{span['stage']}"].append(span["ms"])
+    applog.log("run", path=TIMING_FILE, **record)
+
+
+def last():
+    """ the record of the latest finished run, of any session """
+    return _last
+
+
+def summary():
+    """ {stage: {count, p50, p90, p99, max}} in ms over the last WINDOW runs of each stage """
+    with _lock:
+        durations = {k: np.array(v) for k, v in _durations.items()}
+    out = {}
+    for name, values in sorted(durations.items()):
+        p50, p90, p99 = np.percentile(values, [50, 90, 99])
+        out[name] = {"count": len(values), "p50": float(p50), "p90": float(p90), "p99": float(p99),
+                     "max": float(values.max())}
+    return out
+
+
+def clear():
+    global _last
+    with _lock:
+        _durations.clear()
+        _last = None